@@ -4,6 +4,7 @@ import json
 import os
 import subprocess
 import requests
+from urllib3.exceptions import ReadTimeoutError
 import logging
 from datetime import datetime
 import yaml
@@ -11,6 +12,21 @@ import re
 from flask import request
 from werkzeug.utils import secure_filename
 import tempfile
+import socket
+import shlex
+from urllib.parse import urlparse, quote
+import queue
+import heapq
+import zlib
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed
+import time
+import threading
+import hashlib
+import math
+import copy
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 
 
 # 🔧 Setup logging
@@ -18,22 +34,230 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+sock = Sock(app)
 
 # 🔗 Podman API Endpoint
 PODMAN_API = "http://192.168.192.155:2375"
 
+# 🖧 Podman nodes reachable for image transfer (name -> API endpoint)
+PRIMARY_NODE = "fcos"
+PODMAN_NODES = {
+    PRIMARY_NODE: PODMAN_API,
+}
+
+
+# 🛡️ Circuit Breakers & Admission Control
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling an upstream whose breaker is open or whose queue is full"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Per-upstream circuit breaker with a concurrency limit.
+
+    closed    - calls go through; `failure_threshold` consecutive failures open it
+    open      - calls fail fast until `reset_timeout` has elapsed
+    half_open - a single probe call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=10,
+                 max_concurrency=8, max_waiting=16, queue_timeout=10):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_concurrency = max_concurrency
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.in_flight = 0
+        self.waiting = 0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def retry_after(self):
+        with self._lock:
+            if self.state == "open":
+                return max(1, int(self.opened_at + self.reset_timeout - time.monotonic()) + 1)
+            return 1
+
+    def allow(self):
+        """False to fail fast, "probe" for the single half-open probe, True otherwise"""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                logger.info(f"Circuit '{self.name}' half-open, probing")
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return "probe"
+            return False
+
+    def acquire(self):
+        with self._lock:
+            if self.waiting >= self.max_waiting:
+                return False
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+        return acquired
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def abandon(self):
+        """Give up a probe slot without recording an outcome"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit '{self.name}' closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.error(f"Circuit '{self.name}' opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def is_open(self):
+        """True while calls would fail fast (open and not yet due for a probe)"""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def saturated(self):
+        with self._lock:
+            return self.waiting >= self.max_waiting
+
+    def snapshot(self):
+        with self._lock:
+            return {"name": self.name, "state": self.state, "failures": self.failures,
+                    "in_flight": self.in_flight, "waiting": self.waiting,
+                    "max_concurrency": self.max_concurrency}
+
+
+PODMAN_BREAKER = CircuitBreaker("Podman", failure_threshold=3, reset_timeout=10,
+                                max_concurrency=8, max_waiting=16)
+DOCKER_HUB_BREAKER = CircuitBreaker("Docker Hub", failure_threshold=3, reset_timeout=30,
+                                    max_concurrency=4, max_waiting=8, queue_timeout=5)
+BREAKERS = [PODMAN_BREAKER, DOCKER_HUB_BREAKER]
+
+
+@contextmanager
+def upstream_call(breaker, count_timeouts=True, hold_slot=True):
+    """Admit one call through an upstream's breaker and concurrency limit.
+
+    Yields record(ok) for reporting the outcome. Connection errors and timeouts
+    raised inside count as failures; with count_timeouts=False a read timeout does
+    not, for long-running operations where slow is not broken. Calls that run for
+    minutes pass hold_slot=False and are limited by the caller instead. Any other
+    exception, or leaving without an outcome, hands back a half-open probe so the
+    breaker cannot get stuck.
+    Raises UpstreamUnavailable without touching the network when the breaker is open
+    or no slot frees up in time.
+    """
+    admitted = breaker.allow()
+    if not admitted:
+        raise UpstreamUnavailable(f"{breaker.name} circuit open", breaker.retry_after())
+    if hold_slot and not breaker.acquire():
+        if admitted == "probe":
+            breaker.abandon()
+        raise UpstreamUnavailable(f"{breaker.name} is overloaded", 1)
+
+    recorded = []
+
+    def record(ok):
+        if not recorded:
+            recorded.append(ok)
+            breaker.record_success() if ok else breaker.record_failure()
+
+    try:
+        yield record
+    except requests.exceptions.ReadTimeout:
+        if count_timeouts:
+            record(False)
+        raise
+    except (requests.exceptions.RequestException, OSError):
+        record(False)
+        raise
+    finally:
+        if hold_slot:
+            breaker.release()
+        if not recorded and admitted == "probe":
+            breaker.abandon()
+
+
+def upstream_request(breaker, method, url, count_timeouts=True, hold_slot=True, **kwargs):
+    """Send a request through an upstream's breaker; 5xx responses count as failures"""
+    with upstream_call(breaker, count_timeouts, hold_slot) as record:
+        response = requests.request(method, url, **kwargs)
+        record(response.status_code < 500)
+    return response
+
+
+def hub_get(url):
+    """GET from Docker Hub through its circuit breaker"""
+    return upstream_request(DOCKER_HUB_BREAKER, "GET", url, timeout=5)
+
+
+# Mutating routes that are plain GET links in the UI
+MUTATING_GET_ENDPOINTS = {
+    "start_container", "stop_container", "remove_container",
+    "remove_image", "prune_images", "remove_volume", "remove_network",
+}
+# Mutating routes that never touch the Podman API
+SHED_EXEMPT_ENDPOINTS = {"upload_file"}
+
+
+@app.before_request
+def shed_load():
+    """Reject mutating requests with 503 while Podman is down or its queue is full"""
+    mutating = request.method in ("POST", "PUT", "PATCH", "DELETE") or request.endpoint in MUTATING_GET_ENDPOINTS
+    if not mutating or request.endpoint in SHED_EXEMPT_ENDPOINTS:
+        return None
+    if PODMAN_BREAKER.is_open():
+        retry_after = PODMAN_BREAKER.retry_after()
+    elif PODMAN_BREAKER.saturated():
+        retry_after = 1
+    else:
+        return None
+    logger.warning(f"Shedding {request.method} {request.path}: Podman unavailable (retry in {retry_after}s)")
+    return {"error": "Podman API unavailable, try again later"}, 503, {"Retry-After": str(retry_after)}
+
 
 def api_get(endpoint):
     url = f"{PODMAN_API}{endpoint}"
     logger.info(f"GET {url}")
     try:
-        response = requests.get(url, timeout=5)
+        response = upstream_request(PODMAN_BREAKER, "GET", url, timeout=5)
         logger.info(f"Status: {response.status_code}, Body (truncated): {response.text[:200]}")
         if response.status_code == 200:
             return response.json()
         else:
             logger.error(f"GET {url} -> {response.status_code}: {response.text}")
             return []
+    except UpstreamUnavailable as e:
+        logger.warning(f"GET {url} skipped: {e}")
+        return []
     except requests.exceptions.ConnectionError:
         logger.error(f"Connection refused: {url}")
         return []
@@ -45,11 +269,16 @@ def api_get(endpoint):
         return []
 
 
-def api_post(endpoint, json=None):
+# Image pulls can legitimately take minutes; their read timeouts are not Podman failures
+PULL_OPTIONS = {"timeout": (5, 600), "count_timeouts": False}
+
+
+def api_post(endpoint, json=None, timeout=10, count_timeouts=True):
     url = f"{PODMAN_API}{endpoint}"
     logger.info(f"POST {url}, JSON: {json}")
     try:
-        response = requests.post(url, json=json, timeout=10)
+        response = upstream_request(PODMAN_BREAKER, "POST", url, json=json, timeout=timeout,
+                                    count_timeouts=count_timeouts)
         logger.info(f"Status: {response.status_code}, Body: {response.text}")
         return response
     except Exception as e:
@@ -61,7 +290,7 @@ def api_delete(endpoint):
     url = f"{PODMAN_API}{endpoint}"
     logger.info(f"DELETE {url}")
     try:
-        response = requests.delete(url, timeout=10)
+        response = upstream_request(PODMAN_BREAKER, "DELETE", url, timeout=10)
         logger.info(f"Status: {response.status_code}, Body: {response.text}")
         return response
     except Exception as e:
@@ -103,7 +332,9 @@ def index():
                            images=images,
                            volumes=volumes,
                            networks=networks,
-                           info=info)
+                           info=info,
+                           breakers=[b.snapshot() for b in BREAKERS],
+                           nodes=list(PODMAN_NODES))
 
 
 # 🧱 Container Actions
@@ -143,13 +374,489 @@ def view_logs(cid):
     logger.info(f"Fetching logs for {cid}")
     params = {"stdout": "true", "stderr": "true", "tail": "200"}
     try:
-        response = requests.get(f"{PODMAN_API}/containers/{cid}/logs", params=params, timeout=5)
+        response = upstream_request(PODMAN_BREAKER, "GET", f"{PODMAN_API}/containers/{cid}/logs", params=params, timeout=5)
         logs = response.text or "No logs"
     except Exception as e:
         logs = f"Error fetching logs: {str(e)}"
         logger.error(f"Log fetch failed for {cid}: {e}")
     return render_template("logs.html", cid=cid, logs=logs)
 
+# 💻 Exec Terminal - xterm.js <-> WebSocket <-> Podman hijacked exec stream
+EXEC_COMMAND = ["/bin/sh"]  # fixed server-side; never taken from the request
+EXEC_IDLE_TIMEOUT = 900  # seconds without input or output before a session is closed
+EXEC_READ_SIZE = 65536
+EXEC_MAX_SIZE = 1000  # rows/cols accepted in a resize message
+_exec_sessions = set()
+_exec_lock = threading.Lock()
+
+
+class ExecSession:
+    """One interactive exec: the Podman stream socket and the browser WebSocket.
+
+    Podman output is relayed on the session's own thread through the library's
+    ws.send(), so a slow browser only ever blocks its own session.
+    """
+
+    def __init__(self, exec_id, sock, ws):
+        self.exec_id = exec_id
+        self.sock = sock
+        self.ws = ws
+        self.last_active = time.monotonic()
+        self.closed = False
+        self._send_lock = threading.Lock()
+        self._relay = threading.Thread(target=self._relay_output, name=f"exec-{exec_id[:12]}", daemon=True)
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def idle_remaining(self):
+        return EXEC_IDLE_TIMEOUT - (time.monotonic() - self.last_active)
+
+    def send(self, data):
+        """Send one frame to the browser; the handler and the relay never interleave"""
+        with self._send_lock:
+            self.ws.send(data)
+
+    def start(self, pending=b""):
+        with _exec_lock:
+            _exec_sessions.add(self)
+        if pending:
+            self.send(pending)
+        self._relay.start()
+
+    def _relay_output(self):
+        try:
+            while True:
+                data = self.sock.recv(EXEC_READ_SIZE)
+                if not data:
+                    break
+                self.touch()
+                self.send(data)
+        except (ConnectionClosed, OSError):
+            pass
+        if not self.closed:
+            logger.info(f"Exec {self.exec_id[:12]} stream ended")
+        self.close()
+
+    def close(self):
+        with _exec_lock:
+            if self.closed:
+                return
+            self.closed = True
+            _exec_sessions.discard(self)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        # Never write the close frame into the middle of a data frame; a relay stuck
+        # on a stalled browser is left to the connection teardown instead
+        if self._send_lock.acquire(timeout=5):
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            finally:
+                self._send_lock.release()
+
+
+def exec_session_count():
+    with _exec_lock:
+        return len(_exec_sessions)
+
+
+def exec_attach(exec_id):
+    """Start an exec and return (socket, bytes already read past the HTTP response head).
+
+    The connect and handshake count against PODMAN_BREAKER like any other call;
+    the established stream does not hold a concurrency slot.
+    """
+    url = urlparse(PODMAN_API)
+    body = json.dumps({"Detach": False, "Tty": True}).encode()
+    with upstream_call(PODMAN_BREAKER) as record:
+        conn = socket.create_connection((url.hostname, url.port or 80), timeout=10)
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.sendall(
+                f"POST /exec/{exec_id}/start HTTP/1.1\r\n"
+                f"Host: {url.netloc}\r\n"
+                "Content-Type: application/json\r\n"
+                "Connection: Upgrade\r\n"
+                "Upgrade: tcp\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+
+            buf = b""
+            while b"\r\n\r\n" not in buf:
+                chunk = conn.recv(4096)
+                if not chunk or len(buf) > 65536:
+                    raise ConnectionError("exec start: no HTTP response from Podman")
+                buf += chunk
+            head, rest = buf.split(b"\r\n\r\n", 1)
+            status_line = head.split(b"\r\n", 1)[0].decode(errors="replace")
+            status = status_line.split(" ")[1:2]
+            record(not (status and status[0].isdigit() and int(status[0]) >= 500))
+            if status not in (["101"], ["200"]):
+                raise ConnectionError(f"exec start failed: {status_line} {rest[:200].decode(errors='replace')}")
+            conn.settimeout(None)
+            return conn, rest
+        except Exception:
+            conn.close()
+            raise
+
+
+@app.route("/containers/exec/<cid>")
+def exec_page(cid):
+    return render_template("exec.html", cid=cid, cmd=shlex.join(EXEC_COMMAND))
+
+
+@app.before_request
+def check_exec_origin():
+    """Refuse cross-site WebSocket handshakes to the exec terminal"""
+    if request.endpoint != "exec_terminal":
+        return None
+    # Compare hosts only: behind a TLS-terminating proxy the page is https while Flask sees http
+    origin = request.headers.get("Origin", "")
+    forwarded = request.headers.get("X-Forwarded-Host", "").split(",")[0].strip()
+    if not origin or urlparse(origin).netloc not in {request.host, forwarded} - {""}:
+        logger.warning(f"Rejected exec handshake from origin '{origin or '-'}'")
+        return {"error": "Cross-origin exec sessions are not allowed"}, 403
+    return None
+
+
+@sock.route("/containers/exec/<cid>/ws")
+def exec_terminal(ws, cid):
+    """Binary frames are keystrokes; text frames are JSON control messages ({"type": "resize", ...})"""
+    logger.info(f"Exec '{shlex.join(EXEC_COMMAND)}' in {cid} ({exec_session_count()} sessions active)")
+
+    resp = api_post(f"/containers/{cid}/exec", json={
+        "AttachStdin": True, "AttachStdout": True, "AttachStderr": True,
+        "Tty": True, "Cmd": EXEC_COMMAND,
+    })
+    if not (resp and resp.status_code == 201):
+        ws.send(f"\r\nExec failed: {resp.text[:200] if resp else 'No response'}\r\n")
+        return
+    exec_id = resp.json().get("Id")
+
+    try:
+        stream, pending = exec_attach(exec_id)
+    except (OSError, UpstreamUnavailable) as e:
+        logger.error(f"Exec attach failed for {cid}: {e}")
+        ws.send(f"\r\nExec failed: {e}\r\n")
+        return
+
+    session = ExecSession(exec_id, stream, ws)
+    try:
+        session.start(pending)
+        while not session.closed:
+            remaining = session.idle_remaining()
+            if remaining <= 0:
+                session.send("\r\n[session closed after idle timeout]\r\n")
+                break
+            msg = ws.receive(timeout=remaining)
+            if msg is None:
+                continue
+            session.touch()
+            if isinstance(msg, bytes):
+                stream.sendall(msg)
+                continue
+            try:
+                control = json.loads(msg)
+            except ValueError:
+                stream.sendall(msg.encode())
+                continue
+            if not isinstance(control, dict) or control.get("type") != "resize":
+                continue
+            try:
+                rows, cols = int(control.get("rows", 24)), int(control.get("cols", 80))
+            except (TypeError, ValueError, OverflowError):
+                continue
+            if 0 < rows <= EXEC_MAX_SIZE and 0 < cols <= EXEC_MAX_SIZE:
+                api_post(f"/exec/{exec_id}/resize?h={rows}&w={cols}")
+    except (ConnectionClosed, OSError):
+        pass
+    finally:
+        session.close()
+        logger.info(f"Exec {exec_id[:12]} in {cid} closed")
+
+# 📜 Aggregated Logs - parallel fetch, k-way merge by timestamp, server-side filtering
+LOG_MAX_SOURCES = 32  # containers per request
+LOG_QUEUE_LINES = 256  # lines buffered per container; bounds memory regardless of log volume
+LOG_MAX_LINE = 65536  # longer lines are split so a missing newline cannot grow the buffer
+LOG_FOLLOW_LAG = 0.5  # seconds a live stream may stay silent before the merge moves past it
+LOG_KEEPALIVE = 15  # seconds between keepalive lines while following idle streams
+LOG_OPEN_CONCURRENCY = 4  # log streams being opened at once, across requests; under PODMAN_BREAKER's limit
+LOG_OPEN_RETRIES = 5  # attempts to open a stream while Podman is busy before reporting an error
+_LOG_EOF = object()
+_log_open_slots = threading.BoundedSemaphore(LOG_OPEN_CONCURRENCY)
+
+
+def _log_ts(stamp):
+    """RFC3339Nano timestamp -> integer nanoseconds since the epoch (None if unparseable)"""
+    match = re.match(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$", stamp)
+    if not match:
+        return None
+    base, frac, zone = match.groups()
+    dt = datetime.fromisoformat(base + ("+00:00" if zone == "Z" else zone))
+    return int(dt.timestamp()) * 1_000_000_000 + int((frac or "0")[:9].ljust(9, "0"))
+
+
+def _log_time_arg(value):
+    """Accept a unix timestamp, an RFC3339 time or a duration ago ('10m') for since/until"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    if re.match(r"^\d+(\.\d+)?$", value):
+        return value
+    try:
+        return str(int(time.time() - parse_duration(value) / 1e9))
+    except ValueError:
+        pass
+    return str(int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()))
+
+
+def _iter_log_chunks(response):
+    """Yield (stream, bytes) from a logs response, demultiplexing the 8-byte frame headers of non-TTY containers"""
+    raw = response.raw
+    head = raw.read(8)
+    if len(head) == 8 and head[0] in (0, 1, 2) and head[1:4] == b"\0\0\0":
+        while len(head) == 8:
+            stream = "stderr" if head[0] == 2 else "stdout"
+            left = int.from_bytes(head[4:8], "big")
+            # A frame can be up to 4 GiB; never hold more than LOG_MAX_LINE of it at once
+            while left:
+                piece = raw.read(min(left, LOG_MAX_LINE))
+                if not piece:
+                    return
+                left -= len(piece)
+                yield stream, piece
+            head = raw.read(8)
+        return
+    # TTY containers send a raw stream; read whatever is available so follow mode stays live
+    read = getattr(raw, "read1", None) or (lambda n: raw.read(1024))
+    chunk = head
+    while chunk:
+        yield "stdout", chunk
+        chunk = read(65536)
+
+
+class LogSource:
+    """Reads one container's log stream on its own thread into a small bounded queue"""
+
+    def __init__(self, container_id, name, params, matcher, wakeup):
+        self.container_id = container_id
+        self.name = name
+        self.params = params
+        self.matcher = matcher
+        self.wakeup = wakeup
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_LINES)
+        self.stopped = threading.Event()
+        self.response = None
+        self.thread = threading.Thread(target=self._run, name=f"logs-{container_id[:12]}", daemon=True)
+
+    def _put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=1)
+                self.wakeup.set()
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _emit(self, stream, text):
+        stamp, _, message = text.partition(" ")
+        ts = _log_ts(stamp)
+        if ts is None:
+            stamp, ts, message = "", 0, text
+        if self.matcher and not self.matcher(message):
+            return True
+        return self._put((ts, {"ts": stamp, "container": self.name, "stream": stream, "line": message}))
+
+    def _open(self):
+        """Open the logs stream through the shared pool, retrying while Podman is busy.
+
+        Returns None if the merge was stopped first.
+        """
+        for attempt in range(LOG_OPEN_RETRIES):
+            while not _log_open_slots.acquire(timeout=1):
+                if self.stopped.is_set():
+                    return None
+            try:
+                return upstream_request(
+                    PODMAN_BREAKER, "GET", f"{PODMAN_API}/containers/{self.container_id}/logs",
+                    params=self.params, stream=True,
+                    timeout=(5, None if self.params.get("follow") == "true" else 30))
+            except UpstreamUnavailable as e:
+                if attempt == LOG_OPEN_RETRIES - 1:
+                    raise
+                delay = min(e.retry_after, 2 ** attempt)
+                logger.warning(f"Log stream for {self.name} deferred {delay}s: {e}")
+            finally:
+                _log_open_slots.release()
+            if self.stopped.wait(delay):
+                return None
+
+    def _run(self):
+        try:
+            self.response = self._open()
+            if self.response is None:
+                return
+            if self.response.status_code != 200:
+                self._emit("stderr", f"error fetching logs: {self.response.status_code} {self.response.text[:200]}")
+                return
+            partial = {}
+            for stream, chunk in _iter_log_chunks(self.response):
+                if self.stopped.is_set():
+                    return
+                lines = (partial.pop(stream, b"") + chunk).split(b"\n")
+                if len(lines[-1]) > LOG_MAX_LINE:
+                    lines.append(b"")
+                elif lines[-1]:
+                    partial[stream] = lines[-1]
+                for line in lines[:-1]:
+                    if not self._emit(stream, line.decode("utf-8", errors="replace").rstrip("\r")):
+                        return
+            for stream, rest in partial.items():
+                self._emit(stream, rest.decode("utf-8", errors="replace"))
+        except Exception as e:
+            if not self.stopped.is_set():
+                logger.error(f"Log stream for {self.name} failed: {e}")
+                self._emit("stderr", f"error fetching logs: {e}")
+        finally:
+            self._put(_LOG_EOF)
+
+    def start(self):
+        self.thread.start()
+
+    def next(self, timeout):
+        """Next (ts, record), _LOG_EOF, or None if nothing arrived within timeout"""
+        try:
+            return self.queue.get(timeout=timeout) if timeout != 0 else self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        self.stopped.set()
+        if self.response is not None:
+            self.response.close()
+
+
+def merge_logs(sources, follow):
+    """k-way heap merge of per-container streams, each already ordered by time.
+
+    Without follow every stream is drained in order. With follow, a stream that stays
+    silent for LOG_FOLLOW_LAG is skipped so live output from the others keeps flowing;
+    it rejoins the merge as soon as it produces a line.
+    """
+    wakeup = sources[0].wakeup if sources else threading.Event()
+    heap = []
+    seq = 0
+    waiting = [(src, False) for src in sources]  # (source, idle)
+    last_keepalive = time.monotonic()
+    try:
+        while heap or waiting:
+            still_waiting = []
+            lag_deadline = time.monotonic() + LOG_FOLLOW_LAG  # shared, so silent streams cost one lag per round
+            for src, idle in waiting:
+                if not follow:
+                    timeout = None
+                else:
+                    timeout = 0 if idle else max(lag_deadline - time.monotonic(), 0)
+                item = src.next(timeout)
+                if item is _LOG_EOF:
+                    continue
+                if item is None:
+                    still_waiting.append((src, True))
+                    continue
+                seq += 1
+                heapq.heappush(heap, (item[0], seq, src, item[1]))
+            waiting = still_waiting
+
+            if heap:
+                _, _, src, record = heapq.heappop(heap)
+                waiting.append((src, False))
+                yield record
+                continue
+
+            if not waiting:
+                break
+
+            # Only idle live streams left: sleep until any of them produces a line
+            wakeup.clear()
+            if not any(not src.queue.empty() for src, _ in waiting):
+                wakeup.wait(timeout=LOG_KEEPALIVE)
+            if time.monotonic() - last_keepalive >= LOG_KEEPALIVE:
+                last_keepalive = time.monotonic()
+                yield None
+    finally:
+        for src in sources:
+            src.stop()
+
+
+def _resolve_log_containers(ids, label, project):
+    """Return [(id, name)] for explicit IDs, a label selector or a compose project"""
+    filters = {}
+    if label:
+        filters["label"] = [label]
+    if project:
+        filters.setdefault("label", []).append(f"com.docker.compose.project={project}")
+    if ids:
+        filters["id"] = ids
+    if not filters:
+        return []
+    containers = api_get(f"/containers/json?all=true&filters={quote(json.dumps(filters))}")
+    found = [(c["Id"], (c.get("Names") or [c["Id"][:12]])[0].lstrip("/")) for c in containers if isinstance(c, dict)]
+    return found[:LOG_MAX_SOURCES]
+
+
+@app.route("/api/logs")
+def aggregate_logs():
+    ids = [i for i in request.args.get("ids", "").split(",") if i.strip()]
+    label = request.args.get("label", "").strip()
+    project = request.args.get("project", "").strip()
+    needle = request.args.get("q", "")
+    pattern = request.args.get("regex", "")
+    follow = request.args.get("follow", "false").lower() in ("1", "true", "yes")
+
+    try:
+        matcher = re.compile(pattern).search if pattern else None
+        since = _log_time_arg(request.args.get("since"))
+        until = _log_time_arg(request.args.get("until"))
+    except (re.error, ValueError) as e:
+        return {"error": f"Invalid filter: {e}"}, 400
+    if needle:
+        matcher = (lambda m, search=matcher: needle in m and search(m)) if matcher else (lambda m: needle in m)
+
+    containers = _resolve_log_containers(ids, label, project)
+    if not containers:
+        return {"error": "No matching containers"}, 404
+
+    params = {"stdout": "true", "stderr": "true", "timestamps": "true", "follow": "true" if follow else "false"}
+    if since:
+        params["since"] = since
+    if until:
+        params["until"] = until
+    if request.args.get("tail"):
+        params["tail"] = request.args["tail"]
+
+    logger.info(f"Aggregating logs from {len(containers)} containers (follow={follow}, filter={pattern or needle or None})")
+    wakeup = threading.Event()
+    sources = [LogSource(cid, name, params, matcher, wakeup) for cid, name in containers]
+    for src in sources:
+        src.start()
+
+    def generate():
+        for record in merge_logs(sources, follow):
+            yield (json.dumps(record) if record else "") + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+
+@app.route("/logs")
+def aggregate_logs_page():
+    return render_template("logs_aggregate.html", project=request.args.get("project", ""))
+
+
 # @app.route("/images/pull-stream")
 # def pull_image_stream():
 #     image = request.args.get("image", "alpine:latest")
@@ -187,7 +894,7 @@ def pull_image():
 
     full_name = f"{repo}:{tag}" if tag else repo
     logger.info(f"Pulling image: {full_name}")
-    resp = api_post(f"/images/create?fromImage={full_name}")
+    resp = api_post(f"/images/create?fromImage={full_name}", **PULL_OPTIONS)
 
     if resp and resp.status_code in [200, 201]:
         logger.info(f"Image {full_name} pulled successfully")
@@ -216,6 +923,232 @@ def prune_images():
     return redirect(url_for("index"))
 
 
+# 🚚 Image Transfer - save/load streamed in fixed-size chunks, never buffered or spooled to disk
+IMAGE_CHUNK_SIZE = 1024 * 1024
+IMAGE_MAX_TRANSFERS = 2  # concurrent uploads per node; they hold no breaker slot while the body streams
+_node_breakers = {}
+_transfer_slots = {}
+_node_lock = threading.Lock()
+
+
+class ImageSourceError(Exception):
+    """The node an image is saved from failed; carries the status to report to the client"""
+
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+
+def node_breaker(node):
+    """Circuit breaker for a Podman node; the primary node shares PODMAN_BREAKER"""
+    if PODMAN_NODES[node] == PODMAN_API:
+        return PODMAN_BREAKER
+    with _node_lock:
+        if node not in _node_breakers:
+            _node_breakers[node] = CircuitBreaker(f"Podman ({node})", max_concurrency=4, max_waiting=8)
+            BREAKERS.append(_node_breakers[node])
+        return _node_breakers[node]
+
+
+@contextmanager
+def transfer_slot(node):
+    """Reserve one of a node's IMAGE_MAX_TRANSFERS upload slots, failing fast when all are taken"""
+    with _node_lock:
+        slots = _transfer_slots.setdefault(node, threading.BoundedSemaphore(IMAGE_MAX_TRANSFERS))
+    if not slots.acquire(blocking=False):
+        raise UpstreamUnavailable(f"too many image transfers to {node}", 5)
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def _metered(chunks, stats, key):
+    """Pass chunks through, counting bytes into stats[key]"""
+    for chunk in chunks:
+        stats[key] += len(chunk)
+        yield chunk
+
+
+def _gzip_chunks(chunks):
+    """Gzip a byte stream on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def _throughput(stats, started):
+    seconds = max(time.monotonic() - started, 1e-6)
+    return {**stats, "seconds": round(seconds, 3),
+            "mb_per_s": round(stats["bytes_in"] / 1024 / 1024 / seconds, 2)}
+
+
+def image_save_stream(node, name):
+    """Open /images/{name}/get on a node; returns the streaming response"""
+    url = f"{PODMAN_NODES[node]}/images/{quote(name, safe='')}/get"
+    logger.info(f"Saving image {name} from {node}: GET {url}")
+    resp = upstream_request(node_breaker(node), "GET", url, stream=True, timeout=(5, 60), count_timeouts=False)
+    if resp.status_code != 200:
+        message = f"save {name} failed: {resp.status_code} {resp.text[:200]}"
+        resp.close()
+        raise ImageSourceError(message, 404 if resp.status_code == 404 else 502)
+    return resp
+
+
+def _source_chunks(node, resp):
+    """Iterate a save stream, charging read errors to the source node's breaker.
+
+    The chunks are consumed inside the target's load request, so a source failure
+    is re-raised as ImageSourceError rather than a requests error the target's
+    breaker would count.
+    """
+    try:
+        yield from resp.iter_content(IMAGE_CHUNK_SIZE)
+    except (requests.exceptions.RequestException, OSError) as e:
+        # requests wraps a stalled read as ConnectionError(ReadTimeoutError); slow is not broken
+        if not (e.args and isinstance(e.args[0], ReadTimeoutError)):
+            node_breaker(node).record_failure()
+        raise ImageSourceError(f"save stream from {node} broke: {e}") from e
+
+
+def image_load_stream(node, chunks):
+    """POST a tar stream to /images/load on a node using chunked transfer encoding.
+
+    The upload can run for minutes, so it takes a transfer slot rather than one of
+    the breaker's slots; the breaker still gates admission and records the outcome.
+    """
+    url = f"{PODMAN_NODES[node]}/images/load"
+    logger.info(f"Loading image stream into {node}: POST {url}")
+    with transfer_slot(node):
+        return upstream_request(node_breaker(node), "POST", url, data=chunks,
+                                headers={"Content-Type": "application/x-tar"}, timeout=(5, 600),
+                                count_timeouts=False, hold_slot=False)
+
+
+@app.route("/images/save/<path:name>")
+def save_image(name):
+    node = request.args.get("node", PRIMARY_NODE)
+    compress = request.args.get("compress") == "gzip"
+    if node not in PODMAN_NODES:
+        return {"error": f"Unknown node '{node}'"}, 404
+    try:
+        resp = image_save_stream(node, name)
+    except ImageSourceError as e:
+        logger.error(f"Image save failed for {name}: {e}")
+        return {"error": str(e)}, e.status
+    except (UpstreamUnavailable, requests.exceptions.RequestException) as e:
+        logger.error(f"Image save failed for {name}: {e}")
+        return {"error": str(e)}, 502
+
+    stats = {"bytes_in": 0, "bytes_out": 0}
+    started = time.monotonic()
+
+    def generate():
+        try:
+            chunks = _metered(_source_chunks(node, resp), stats, "bytes_in")
+            yield from _metered(_gzip_chunks(chunks) if compress else chunks, stats, "bytes_out")
+            logger.info(f"Saved image {name} from {node}: {_throughput(stats, started)}")
+        finally:
+            resp.close()
+
+    filename = secure_filename(name.replace(":", "_").replace("/", "_")) + (".tar.gz" if compress else ".tar")
+    return Response(generate(), mimetype="application/gzip" if compress else "application/x-tar",
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+@app.route("/images/load", methods=["POST"])
+def load_image():
+    """Stream the raw request body (a tar or tar.gz) into Podman without touching local disk"""
+    node = request.args.get("node", PRIMARY_NODE)
+    if node not in PODMAN_NODES:
+        return {"error": f"Unknown node '{node}'"}, 404
+
+    stats = {"bytes_in": 0, "bytes_out": 0}
+    started = time.monotonic()
+
+    def body():
+        while True:
+            chunk = request.stream.read(IMAGE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    try:
+        resp = image_load_stream(node, _metered(body(), stats, "bytes_in"))
+    except UpstreamUnavailable as e:
+        logger.warning(f"Image load into {node} refused: {e}")
+        return {"error": str(e)}, 503, {"Retry-After": str(e.retry_after)}
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Image load into {node} failed: {e}")
+        return {"error": str(e)}, 502
+    stats["bytes_out"] = stats["bytes_in"]
+
+    report = _throughput(stats, started)
+    if resp.status_code != 200:
+        logger.error(f"Image load into {node} failed: {resp.status_code} {resp.text[:200]}")
+        return {"error": resp.text[:500], **report}, 502
+    logger.info(f"Loaded image into {node}: {report}")
+    return {"node": node, "result": resp.text.strip(), **report}
+
+
+@app.route("/images/copy", methods=["POST"])
+def copy_image():
+    """Pipe one node's save stream straight into another node's load"""
+    data = request.get_json(silent=True) or request.form
+    image = (data.get("image") or "").strip()
+    source = data.get("source") or PRIMARY_NODE
+    target = data.get("target") or ""
+    compress = str(data.get("compress", "")).lower() in ("1", "true", "on", "gzip")
+
+    def reply(payload, status=200):
+        if request.is_json:
+            return payload, status
+        message = payload.get("error") or (
+            f"Copied {image} to {target}: {payload['bytes_in'] / 1024 / 1024:.1f} MB "
+            f"in {payload['seconds']}s ({payload['mb_per_s']} MB/s)")
+        return f"<script>alert({json.dumps(message)}); history.back();</script>"
+
+    if not image:
+        return reply({"error": "No image given"}, 400)
+    if source not in PODMAN_NODES or target not in PODMAN_NODES:
+        return reply({"error": f"Unknown node (known: {', '.join(PODMAN_NODES)})"}, 404)
+    if source == target:
+        return reply({"error": "Source and target node are the same"}, 400)
+
+    stats = {"bytes_in": 0, "bytes_out": 0}
+    started = time.monotonic()
+    try:
+        save_resp = image_save_stream(source, image)
+    except ImageSourceError as e:
+        return reply({"error": f"Save from {source} failed: {e}"}, e.status)
+    except (UpstreamUnavailable, requests.exceptions.RequestException) as e:
+        return reply({"error": f"Save from {source} failed: {e}"}, 502)
+    try:
+        chunks = _metered(_source_chunks(source, save_resp), stats, "bytes_in")
+        chunks = _metered(_gzip_chunks(chunks) if compress else chunks, stats, "bytes_out")
+        load_resp = image_load_stream(target, chunks)
+    except ImageSourceError as e:
+        logger.error(f"Copy of {image} from {source} failed: {e}")
+        return reply({"error": f"Save from {source} failed: {e}"}, e.status)
+    except UpstreamUnavailable as e:
+        return reply({"error": f"Load into {target} refused: {e}"}, 503)
+    except requests.exceptions.RequestException as e:
+        return reply({"error": f"Load into {target} failed: {e}"}, 502)
+    finally:
+        save_resp.close()
+
+    report = {"image": image, "source": source, "target": target, "compressed": compress,
+              **_throughput(stats, started)}
+    if load_resp.status_code != 200:
+        logger.error(f"Copy of {image} to {target} failed: {load_resp.status_code} {load_resp.text[:200]}")
+        return reply({"error": f"Load into {target} failed: {load_resp.text[:200]}", **report}, 502)
+    logger.info(f"Copied image: {report}")
+    return reply(report)
+
+
 # 📁 Volume Actions
 @app.route("/volumes/create", methods=["POST"])
 def create_volume():
@@ -244,160 +1177,791 @@ def remove_volume(vol_name):
     return redirect(url_for("index"))
 
 
-@app.route("/compose/deploy", methods=["GET", "POST"])
-def deploy_compose():
-    if request.method == "POST":
-        # Get YAML from form
-        compose_text = request.form.get("compose_yaml", "").strip()
-        if not compose_text:
-            return "<script>alert('No compose file provided'); history.back();</script>"
+# 📚 Stack Store - compose files are parsed once, validated and compiled to Podman payloads.
+# Compiled plans are cached by content hash; named stacks keep a version history of digests.
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)  # libyaml when available
 
-        try:
-            compose = yaml.safe_load(compose_text)
-        except yaml.YAMLError as e:
-            return f"<script>alert('Invalid YAML: {str(e)}'); history.back();</script>"
-
-        # --- Step 1: Create Networks ---
-        networks = compose.get("networks", {})
-        for name, config in networks.items():
-            if config is None:
-                config = {}
-            payload = {
-                "Name": name,
-                "Driver": config.get("driver", "bridge"),
-                "CheckDuplicate": True
-            }
-            resp = api_post("/networks/create", json=payload)
-            if resp and resp.status_code in [201, 200]:
-                logger.info(f"Network '{name}' created or already exists")
-            else:
-                logger.error(f"Failed to create network '{name}': {resp.text if resp else 'No response'}")
+STACK_CACHE_SIZE = 64
+_stack_lock = threading.Lock()
+_stack_plans = OrderedDict()  # digest -> compiled plan (anonymous entries are LRU-evicted)
+_stacks = {}  # name -> [{"version", "digest", "created"}]
+
+STACK_DEADLINE = 300  # seconds a whole rollout may take before it is rolled back
+STACK_SETTLE = 3  # seconds a container without a healthcheck must stay running to count as ready
+_rollouts = deque(maxlen=20)  # most recent rollout records, with per-service phase timings
+
+
+class _LineMap(dict):
+    """dict that remembers the source line of itself and of each value"""
+    line = 0
+    lines = {}
+
+
+class _LineList(list):
+    """list that remembers the source line of itself and of each item"""
+    line = 0
+    lines = []
+
+
+class StackLoader(_YamlLoader):
+    pass
+
+
+def _construct_line_map(loader, node):
+    data = _LineMap()
+    data.line = node.start_mark.line + 1
+    data.lines = {}
+    yield data
+    data.update(loader.construct_mapping(node))
+    for key_node, value_node in node.value:
+        key = loader.construct_object(key_node)
+        if isinstance(key, (str, int, float, bool)) or key is None:
+            data.lines[key] = value_node.start_mark.line + 1
 
-        # --- Step 2: Process Services ---
-        services = compose.get("services", {})
-        for service_name, svc in services.items():
-            if not svc.get("image"):
-                logger.warning(f"Service '{service_name}' has no image, skipping")
-                continue
 
-            image = svc["image"]
+def _construct_line_list(loader, node):
+    data = _LineList()
+    data.line = node.start_mark.line + 1
+    data.lines = [item.start_mark.line + 1 for item in node.value]
+    yield data
+    data.extend(loader.construct_sequence(node))
 
-            # Pull image
-            logger.info(f"Pulling image: {image}")
-            pull_resp = api_post(f"/images/create?fromImage={image}")
-            if pull_resp and pull_resp.status_code in [200, 201]:
-                logger.info(f"Image {image} pulled")
+
+StackLoader.add_constructor("tag:yaml.org,2002:map", _construct_line_map)
+StackLoader.add_constructor("tag:yaml.org,2002:seq", _construct_line_list)
+
+
+class StackError(Exception):
+    """Compose file failed validation; carries every problem found"""
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def parse_duration(d):
+    """Convert a compose duration ('30s', '1m30s', '1.5s', 5) to nanoseconds"""
+    if isinstance(d, int): return d * 1_000_000_000
+    text = str(d).strip()
+    if re.match(r'^\d+$', text): return int(text) * 1_000_000_000
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ns|us|ms|s|m|h)', text)
+    if not parts or "".join(val + unit for val, unit in parts) != text:
+        raise ValueError(f"Invalid duration: {d}")
+    units = {'ns':1,'us':1e3,'ms':1e6,'s':1e9,'m':60e9,'h':3600e9}
+    return int(sum(float(val) * units[unit] for val, unit in parts))
+
+
+def _line_of(container, key):
+    """Best-effort source line for container[key]"""
+    if isinstance(container, _LineMap):
+        return container.lines.get(key, container.line)
+    if isinstance(container, _LineList):
+        return container.lines[key] if 0 <= key < len(container.lines) else container.line
+    return 0
+
+
+SERVICE_KEYS = {"image", "container_name", "command", "entrypoint", "restart", "ports", "healthcheck",
+                "networks", "volumes", "environment", "depends_on"}
+COMPOSE_KEYS = {"version", "name", "services", "networks", "volumes"}
+RESTART_POLICIES = {"no", "always", "on-failure", "unless-stopped"}
+
+
+def _unsupported_keys(mapping, supported, prefix, errors):
+    """Report keys the compiler would otherwise drop silently; x-* extension fields are allowed"""
+    for key in mapping:
+        if key not in supported and not (isinstance(key, str) and key.startswith("x-")):
+            errors.append(f"line {_line_of(mapping, key)}: {prefix}'{key}' is not supported")
+
+
+def _command_arg(value):
+    """Compose command/entrypoint: a shell-style string or a list of strings"""
+    if isinstance(value, str):
+        return shlex.split(value)
+    if isinstance(value, list) and all(isinstance(v, (str, int, float)) for v in value):
+        return [str(v) for v in value]
+    raise ValueError("must be a string or a list of strings")
+
+
+def _compile_service(service_name, svc, declared_networks, declared_services, errors):
+    def error(key, msg, where=None):
+        line = _line_of(where if where is not None else svc, key)
+        errors.append(f"line {line}: services.{service_name}: {msg}")
+
+    _unsupported_keys(svc, SERVICE_KEYS, f"services.{service_name}: ", errors)
+
+    image = svc.get("image")
+    if not image or not isinstance(image, str):
+        error("image", "'image' is required (build is not supported)")
+
+    # --- Command / Restart ---
+    process = {}
+    for key, field in (("command", "Cmd"), ("entrypoint", "Entrypoint")):
+        if svc.get(key) is not None:
+            try:
+                process[field] = _command_arg(svc[key])
+            except ValueError as e:
+                error(key, f"'{key}' {e}")
+    restart_policy = {}
+    restart = svc.get("restart")
+    if restart is not None:
+        name, _, retries = str(restart).partition(":")
+        if name not in RESTART_POLICIES or (retries and (name != "on-failure" or not retries.isdigit())):
+            error("restart", f"invalid restart policy {restart!r}")
+        else:
+            restart_policy = {"Name": name, "MaximumRetryCount": int(retries or 0)}
+
+    # --- Port Bindings ---
+    port_bindings = {}
+    exposed_ports = {}
+    ports = svc.get("ports", [])
+    if not isinstance(ports, list):
+        error("ports", "'ports' must be a list")
+        ports = []
+    for i, port in enumerate(ports):
+        if isinstance(port, dict):
+            # New style (dict) - rare in compose, but safe
+            container_port = str(port.get("target", ""))
+            host_port = str(port.get("published", "") or "")
+            host_ip = str(port.get("host_ip", "") or "")
+            protocol = port.get("protocol", "tcp")
+        elif isinstance(port, (str, int)):
+            port = str(port)
+            # "[ip:]host:container[/proto]"; "80" alone maps to a random host port
+            parts = port.rsplit(":", 2)
+            container_port, _, protocol = parts[-1].partition("/")
+            host_port = parts[-2] if len(parts) > 1 else ""
+            host_ip = parts[0].strip("[]") if len(parts) > 2 else ""
+            protocol = protocol or "tcp"
+        else:
+            error(i, f"invalid port entry {port!r}", ports)
+            continue
+
+        if "-" in container_port or "-" in host_port:
+            error(i, f"port ranges are not supported: {port!r}", ports)
+            continue
+        if not container_port.isdigit() or (host_port and not host_port.isdigit()):
+            error(i, f"invalid port mapping {port!r}", ports)
+            continue
+
+        port_key = f"{container_port}/{protocol}"
+        exposed_ports[port_key] = {}
+        binding = {"HostPort": host_port}
+        if host_ip:
+            binding["HostIp"] = host_ip
+        port_bindings.setdefault(port_key, []).append(binding)
+
+    # --- Healthcheck ---
+    healthcheck = svc.get("healthcheck") or {}
+    hc_config = {}
+    if not isinstance(healthcheck, dict):
+        error("healthcheck", "'healthcheck' must be a mapping")
+    elif healthcheck.get("disable") is True:
+        hc_config = {"Test": ["NONE"]}
+    elif healthcheck:
+        # Only send what was set: without a test the image's own HEALTHCHECK stays in effect
+        _unsupported_keys(healthcheck, {"test", "interval", "timeout", "start_period", "retries", "disable"},
+                          f"services.{service_name}: healthcheck.", errors)
+        if "test" in healthcheck:
+            test = healthcheck["test"]
+            if isinstance(test, str):
+                hc_config["Test"] = ["CMD-SHELL", test]
+            elif isinstance(test, list) and test and all(isinstance(t, str) for t in test):
+                hc_config["Test"] = test
             else:
-                logger.error(f"Failed to pull {image}")
-                continue
+                error("test", "healthcheck.test must be a string or a list of strings", healthcheck)
+        if "retries" in healthcheck:
+            if isinstance(healthcheck["retries"], int) and not isinstance(healthcheck["retries"], bool):
+                hc_config["Retries"] = healthcheck["retries"]
+            else:
+                error("retries", "healthcheck.retries must be an integer", healthcheck)
+        for field, key in (("Interval", "interval"), ("Timeout", "timeout"), ("StartPeriod", "start_period")):
+            if key in healthcheck:
+                try:
+                    hc_config[field] = parse_duration(healthcheck[key])
+                except ValueError as e:
+                    error(key, f"healthcheck.{key}: {e}", healthcheck)
+
+    # --- Networks ---
+    network_names = []
+    svc_networks = svc.get("networks", [])
+    if isinstance(svc_networks, list):
+        network_names = svc_networks
+    elif isinstance(svc_networks, dict):
+        network_names = list(svc_networks.keys())
+    else:
+        error("networks", "'networks' must be a list or mapping")
+    valid_networks = []
+    for i, name in enumerate(network_names):
+        where = svc_networks if isinstance(svc_networks, list) else None
+        key = i if where is not None else "networks"
+        if not isinstance(name, str):
+            error(key, f"network entry must be a name, got {name!r}", where)
+        elif name not in declared_networks:
+            error(key, f"undefined network '{name}'", where)
+        else:
+            valid_networks.append(name)
+    endpoint_config = {name: {} for name in valid_networks}
+
+    # --- Volumes ---
+    binds = []
+    volumes = svc.get("volumes", [])
+    if not isinstance(volumes, list):
+        error("volumes", "'volumes' must be a list")
+        volumes = []
+    for i, vol in enumerate(volumes):
+        if isinstance(vol, str) and ":" in vol:
+            parts = vol.split(":")
+            host_path = parts[0]
+            container_path = parts[1]
+            mode = parts[2] if len(parts) > 2 else "rw"
+            binds.append(f"{host_path}:{container_path}:{mode},Z")
+        elif not isinstance(vol, str):
+            error(i, f"unsupported volume entry {vol!r}", volumes)
+
+    # --- Environment ---
+    env = svc.get("environment", [])
+    if isinstance(env, dict):
+        env = [f"{k}={'' if v is None else v}" for k, v in env.items()]
+    elif isinstance(env, list):
+        env = [str(e) for e in env]
+    else:
+        error("environment", "'environment' must be a list or mapping")
+        env = []
+
+    # --- Dependencies ---
+    depends_on = svc.get("depends_on", [])
+    if isinstance(depends_on, dict):
+        depends_on = list(depends_on.keys())
+    elif not isinstance(depends_on, list):
+        error("depends_on", "'depends_on' must be a list or mapping")
+        depends_on = []
+    valid_deps = []
+    for dep in depends_on:
+        if not isinstance(dep, str):
+            error("depends_on", f"depends_on entry must be a service name, got {dep!r}")
+        elif dep not in declared_services:
+            error("depends_on", f"depends on undefined service '{dep}'")
+        else:
+            valid_deps.append(dep)
+    depends_on = valid_deps
+
+    # --- Container Config ---
+    container_config = {
+        "Image": image,
+        **process,
+        "Env": env,
+        "ExposedPorts": exposed_ports,
+        "Healthcheck": hc_config,
+        "HostConfig": {
+            "PortBindings": port_bindings,
+            "Binds": binds,
+            **({"RestartPolicy": restart_policy} if restart_policy else {}),
+        },
+        "NetworkingConfig": {
+            "EndpointsConfig": endpoint_config
+        }
+    }
+
+    return {
+        "service": service_name,
+        "container_name": svc.get("container_name", service_name),
+        "image": image,
+        "depends_on": depends_on,
+        "config": container_config,
+    }
+
+
+def _rollout_order(compiled, services, errors):
+    """Order services so each one starts after everything it depends on"""
+    by_name = {svc["service"]: svc for svc in compiled}
+    ordered, state = [], {}
+
+    def visit(name, chain):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            line = _line_of(services[name], "depends_on")
+            errors.append(f"line {line}: services.{name}: dependency cycle {' -> '.join(chain + [name])}")
+            return
+        state[name] = "visiting"
+        for dep in by_name[name]["depends_on"]:
+            if dep in by_name:
+                visit(dep, chain + [name])
+        state[name] = "done"
+        ordered.append(by_name[name])
+
+    for name in by_name:
+        visit(name, [])
+    return ordered
+
+
+def compile_stack(compose_text):
+    """Parse, validate and compile a compose file into a deployment plan.
+
+    Raises StackError listing every problem found.
+    """
+    try:
+        compose = yaml.load(compose_text, Loader=StackLoader)
+    except yaml.MarkedYAMLError as e:
+        mark = e.problem_mark or e.context_mark
+        line = mark.line + 1 if mark else 0
+        raise StackError([f"line {line}: invalid YAML: {e.problem or e}"])
+    except yaml.YAMLError as e:
+        raise StackError([f"invalid YAML: {e}"])
+
+    if not isinstance(compose, dict):
+        raise StackError(["line 1: compose file must be a mapping"])
+
+    errors = []
+    _unsupported_keys(compose, COMPOSE_KEYS, "", errors)
+
+    # --- Volumes ---
+    # Named volumes are created by Podman on first use through Binds; options are not applied
+    volumes = compose.get("volumes") or {}
+    if not isinstance(volumes, dict):
+        errors.append(f"line {_line_of(compose, 'volumes')}: 'volumes' must be a mapping")
+        volumes = {}
+    for name, config in volumes.items():
+        if config:
+            errors.append(f"line {_line_of(volumes, name)}: volumes.{name}: volume options are not supported")
+
+    # --- Networks ---
+    networks = compose.get("networks") or {}
+    network_payloads = []
+    if not isinstance(networks, dict):
+        errors.append(f"line {_line_of(compose, 'networks')}: 'networks' must be a mapping")
+        networks = {}
+    for name, config in networks.items():
+        if config is None:
+            config = {}
+        if not isinstance(config, dict):
+            errors.append(f"line {_line_of(networks, name)}: networks.{name}: must be a mapping")
+            continue
+        _unsupported_keys(config, {"driver"}, f"networks.{name}.", errors)
+        network_payloads.append({
+            "Name": name,
+            "Driver": config.get("driver", "bridge"),
+            "CheckDuplicate": True
+        })
+
+    # --- Services ---
+    services = compose.get("services")
+    compiled = []
+    if not isinstance(services, dict) or not services:
+        errors.append(f"line {_line_of(compose, 'services')}: 'services' must be a non-empty mapping")
+        services = {}
+    for service_name, svc in services.items():
+        if not isinstance(svc, dict):
+            errors.append(f"line {_line_of(services, service_name)}: services.{service_name}: must be a mapping")
+            continue
+        compiled.append(_compile_service(service_name, svc, networks, services, errors))
+
+    compiled = _rollout_order(compiled, services, errors)
+
+    name = compose.get("name")
+    if name is not None and not (isinstance(name, str) and name.strip()):
+        errors.append(f"line {_line_of(compose, 'name')}: 'name' must be a non-empty string")
+
+    if errors:
+        raise StackError(errors)
+
+    return {"name": name, "networks": network_payloads, "services": compiled}
+
+
+def load_stack_plan(compose_text, name=None):
+    """Return (digest, plan), compiling only on a cache miss.
+
+    With a name the digest is recorded as that stack's latest version, under the
+    same lock as the cache insert so it can never be evicted before it is pinned.
+    """
+    digest = hashlib.sha256(compose_text.encode("utf-8")).hexdigest()
+    with _stack_lock:
+        plan = _stack_plans.get(digest)
+        if plan is not None:
+            _stack_plans.move_to_end(digest)
+            if name:
+                _record_stack_version(name, digest)
+            logger.info(f"Stack plan cache hit: {digest[:12]}")
+            return digest, plan
+
+    plan = compile_stack(compose_text)
+
+    with _stack_lock:
+        _stack_plans[digest] = plan
+        if name:
+            _record_stack_version(name, digest)
+        pinned = {v["digest"] for versions in _stacks.values() for v in versions}
+        for old in list(_stack_plans):
+            if len(_stack_plans) <= STACK_CACHE_SIZE:
+                break
+            if old not in pinned:
+                del _stack_plans[old]
+    logger.info(f"Stack plan compiled: {digest[:12]} ({len(plan['services'])} services)")
+    return digest, plan
+
+
+def _record_stack_version(name, digest):
+    """Record digest as the latest version of a named stack; caller holds _stack_lock"""
+    versions = _stacks.setdefault(name, [])
+    if versions and versions[-1]["digest"] == digest:
+        return versions[-1]
+    entry = {"version": len(versions) + 1, "digest": digest,
+             "created": datetime.now().isoformat(timespec="seconds")}
+    versions.append(entry)
+    logger.info(f"Stack '{name}' saved as version {entry['version']} ({digest[:12]})")
+    return entry
+
+
+def get_stack(name, version=None):
+    """Return (entry, plan) for a named stack version (latest by default)"""
+    with _stack_lock:
+        versions = _stacks.get(name, [])
+        if version is None:
+            entry = versions[-1] if versions else None
+        else:
+            entry = next((v for v in versions if v["version"] == version), None)
+        if entry is None:
+            return None, None
+        return entry, _stack_plans.get(entry["digest"])
+
+
+def _with_tag(image, tag):
+    """Swap the tag of an image reference; a value containing ':' or '/' replaces the image"""
+    if ":" in tag or "/" in tag:
+        return tag
+    repo = image.split("@", 1)[0]
+    if ":" in repo.rsplit("/", 1)[-1]:
+        repo = repo.rsplit(":", 1)[0]
+    return f"{repo}:{tag}"
+
+
+def apply_overrides(plan, env=None, images=None):
+    """Return a copy of plan with env vars merged into every service and image tags replaced.
+
+    images maps a service name (or '*' for all services) to a tag or full image reference.
+    """
+    plan = copy.deepcopy(plan)
+    env = env or {}
+    images = images or {}
+    for svc in plan["services"]:
+        config = svc["config"]
+        if env:
+            merged = dict(e.split("=", 1) if "=" in e else (e, "") for e in config["Env"])
+            merged.update({str(k): str(v) for k, v in env.items()})
+            config["Env"] = [f"{k}={v}" for k, v in merged.items()]
+        tag = images.get(svc["service"], images.get("*"))
+        if tag:
+            svc["image"] = config["Image"] = _with_tag(svc["image"], str(tag))
+    return plan
+
+
+def _health_state(container_id):
+    """Return (state, health) from an inspect; health is '' when there is no healthcheck"""
+    info = api_get(f"/containers/{container_id}/json")
+    state = (info.get("State") or {}) if isinstance(info, dict) else {}
+    health = (state.get("Health") or {}).get("Status") or ""
+    return state.get("Status", "unknown"), health
+
+
+def _readiness(state, health):
+    """Map an inspect result to (ok, reason), or None while still waiting"""
+    if state in ("exited", "dead", "stopped"):
+        return False, f"container {state}"
+    if health == "healthy":
+        return True, "healthy"
+    if health == "unhealthy":
+        return False, "unhealthy"
+    return None
+
+
+def wait_healthy(container_id, hc_config, deadline):
+    """Block until a container is ready, woken by Podman events rather than polling.
+
+    Podman applies start_period and retries itself: it only reports 'unhealthy'
+    after `retries` consecutive failures outside the start period, so the wait is
+    bounded by that budget (plus one interval of slack) or the stack deadline.
+    A container with no health status must stay running for STACK_SETTLE seconds,
+    so one that crashes right after starting does not pass.
+    Returns (ok, reason).
+    """
+    if hc_config.get("Test") == ["NONE"]:
+        hc_config = {}
+    interval = hc_config.get("Interval", 30_000_000_000) / 1e9 if hc_config else 5
+    if hc_config:
+        attempts = hc_config.get("Retries", 3) + 1
+        budget = (hc_config.get("StartPeriod", 0)
+                  + (hc_config.get("Interval", 30_000_000_000) + hc_config.get("Timeout", 30_000_000_000)) * attempts) / 1e9
+        deadline = min(deadline, time.monotonic() + budget + interval)
+
+    running_since = None
+
+    def check():
+        nonlocal running_since
+        state, health = _health_state(container_id)
+        if health or state != "running":
+            running_since = None
+            return _readiness(state, health)
+        running_since = running_since or time.monotonic()
+        if time.monotonic() - running_since >= STACK_SETTLE:
+            return True, f"running for {STACK_SETTLE}s (no healthcheck)"
+        return None
 
-            # --- Port Bindings ---
-            # --- Port Bindings ---
-            port_bindings = {}
-            exposed_ports = {}
-            for port in svc.get("ports", []):
-                if isinstance(port, dict):
-                    # New style (dict) - rare in compose, but safe
-                    container_port = str(port.get("target"))
-                    host_port = str(port.get("published"))
-                elif isinstance(port, str):
-                    if ":" in port:
-                        # Long syntax: "8080:80"
-                        parts = port.split(":", 1)
-                        host_port, container_port = parts[0], parts[1]
-                    else:
-                        # Short syntax: "80" → map to random host port
-                        host_port = ""  # Let Podman assign
-                        container_port = port
+    def next_wait():
+        """Seconds until the next inspect is due: one interval, or the end of the settle period"""
+        wait = min(interval, deadline - time.monotonic())
+        if running_since is not None:
+            wait = min(wait, running_since + STACK_SETTLE - time.monotonic())
+        return max(wait, 0.05)
+
+    params = {"filters": json.dumps({"type": ["container"], "container": [container_id]})}
+    while True:
+        if deadline - time.monotonic() <= 0:
+            return False, "timed out waiting for healthy"
+
+        # If no event arrives within one wait the read times out, and we
+        # re-inspect and resubscribe - a fallback for hosts that emit no health events
+        subscribed_at = time.monotonic()
+        wait = next_wait()
+        try:
+            stream = upstream_request(PODMAN_BREAKER, "GET", f"{PODMAN_API}/events", params=params,
+                                      stream=True, timeout=(5, wait))
+            with stream:
+                if stream.status_code != 200:
+                    logger.warning(f"Event stream for {container_id[:12]} refused: {stream.status_code} {stream.text[:200]}")
                 else:
-                    # If port is an integer (e.g., 80)
-                    container_port = str(port)
-                    host_port = ""
+                    # Inspect only after subscribing so a transition in between is not missed
+                    verdict = check()
+                    if verdict:
+                        return verdict
+                    # A settle period that ends before the read timeout is slept out below
+                    settle_first = next_wait() < wait
+                    wait = min(wait, next_wait() + (time.monotonic() - subscribed_at))
+                    for line in ([] if settle_first else stream.iter_lines()):
+                        if not line:
+                            continue
+                        verdict = check()
+                        if verdict:
+                            return verdict
+                        if time.monotonic() >= deadline or time.monotonic() - subscribed_at >= wait:
+                            break
+        except (UpstreamUnavailable, requests.exceptions.RequestException) as e:
+            logger.warning(f"Event stream for {container_id[:12]} interrupted: {e}")
+
+        # A stream that was refused or ended early must not turn into a tight
+        # inspect loop: sleep out the rest of the wait before checking again
+        idle = wait - (time.monotonic() - subscribed_at)
+        if idle > 0:
+            time.sleep(max(min(idle, deadline - time.monotonic()), 0))
+            verdict = check()
+            if verdict:
+                return verdict
+
+
+def retire_stack_containers(label, container_names=()):
+    """Stop and rename a stack's current containers so a redeploy can reuse their names and ports.
+
+    Besides the containers labelled with this project, any stack-deployed container
+    holding one of container_names is retired too (e.g. one from an earlier,
+    differently labelled deploy of the same file).
+    Returns [(id, original name, was_running)] for remove_retired / restore_retired.
+    """
+    filters = quote(json.dumps({"label": ["com.docker.compose.project"]}))
+    retired = []
+    for c in api_get(f"/containers/json?all=true&filters={filters}"):
+        if not isinstance(c, dict):
+            continue
+        container_id = c["Id"]
+        name = (c.get("Names") or [container_id[:12]])[0].lstrip("/")
+        if (c.get("Labels") or {}).get("com.docker.compose.project") != label and name not in container_names:
+            continue
+        was_running = c.get("State") == "running"
+        logger.info(f"Retiring '{name}' ({container_id[:12]}) from stack '{label}'")
+        if was_running:
+            api_post(f"/containers/{container_id}/stop")
+        api_post(f"/containers/{container_id}/rename?name={quote(f'{name}-retired-{container_id[:12]}')}")
+        retired.append((container_id, name, was_running))
+    return retired
+
+
+def remove_retired(retired):
+    """Drop the previous generation of a stack once its replacement is healthy"""
+    for container_id, name, _ in retired:
+        logger.info(f"Removing retired container '{name}' ({container_id[:12]})")
+        api_delete(f"/containers/{container_id}?v=true&force=true")
+
+
+def restore_retired(retired):
+    """Put the previous generation of a stack back under its original names"""
+    for container_id, name, was_running in retired:
+        logger.info(f"Rollback: restoring '{name}' ({container_id[:12]})")
+        api_post(f"/containers/{container_id}/rename?name={quote(name)}")
+        if was_running:
+            api_post(f"/containers/{container_id}/start")
+
+
+def rollback(container_ids, network_names):
+    """Remove everything a failed rollout created, newest first"""
+    for container_id in reversed(container_ids):
+        logger.info(f"Rollback: removing container {container_id[:12]}")
+        api_delete(f"/containers/{container_id}?v=true&force=true")
+    for name in reversed(network_names):
+        logger.info(f"Rollback: removing network '{name}'")
+        api_delete(f"/networks/{name}")
+
+
+def deploy_plan(plan, label, deadline=STACK_DEADLINE):
+    """Roll out a compiled plan in dependency order, waiting for each service to be healthy.
+
+    Containers already running for this stack (by com.docker.compose.project label)
+    are stopped and renamed first, freeing their names and host ports; they are
+    removed once the new rollout is healthy. Any failure removes the containers and
+    networks created so far and restores the previous containers under their
+    original names, restarting the ones that were running.
+    Returns the rollout record, including per-phase timings for every service.
+    """
+    started = time.monotonic()
+    stop_at = started + deadline
+    results = []
+    created_containers = []
+    created_networks = []
+    rollout = {"stack": label, "ok": False, "started": datetime.now().isoformat(timespec="seconds"),
+               "deadline": deadline, "results": results}
+
+    def timed(timings, phase, fn, *args):
+        t0 = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            timings[phase] = round(time.monotonic() - t0, 3)
+
+    # --- Step 1: Create Networks ---
+    for payload in plan["networks"]:
+        name = payload["Name"]
+        resp = api_post("/networks/create", json=payload)
+        if resp and resp.status_code in [201, 200]:
+            created_networks.append(name)
+            logger.info(f"Network '{name}' created or already exists")
+        else:
+            logger.error(f"Failed to create network '{name}': {resp.text if resp else 'No response'}")
+
+    # --- Step 2: Retire the stack's previous containers ---
+    retired = retire_stack_containers(label, {svc["container_name"] for svc in plan["services"]})
+    rollout["replaced"] = [name for _, name, _ in retired]
+
+    # --- Step 3: Process Services ---
+    failure = None
+    for svc in plan["services"]:
+        image = svc["image"]
+        container_name = svc["container_name"]
+        timings = {}
+        result = {"service": svc["service"], "container": container_name, "status": "failed", "timings": timings}
+        results.append(result)
+
+        if time.monotonic() >= stop_at:
+            failure = result["error"] = "stack deadline exceeded"
+            break
+
+        # Pull image
+        logger.info(f"Pulling image: {image}")
+        pull_resp = timed(timings, "pull", lambda: api_post(f"/images/create?fromImage={image}", **PULL_OPTIONS))
+        if not (pull_resp and pull_resp.status_code in [200, 201]):
+            failure = result["error"] = f"failed to pull {image}"
+            break
+        logger.info(f"Image {image} pulled")
 
-                # Ensure container_port is valid
-                if not container_port:
-                    continue
+        # Create container
+        labels = {"com.docker.compose.project": label, "com.docker.compose.service": svc["service"]}
+        create_resp = timed(timings, "create", api_post,
+                            f"/containers/create?name={container_name}", {**svc["config"], "Labels": labels})
+        if not (create_resp and create_resp.status_code == 201):
+            failure = result["error"] = f"failed to create: {create_resp.text[:200] if create_resp else 'No response'}"
+            break
+        container_id = create_resp.json().get("Id")
+        result["id"] = container_id
+        created_containers.append(container_id)
+        logger.info(f"Container '{container_name}' created: {container_id[:12]}")
+
+        # Start container
+        start_resp = timed(timings, "start", api_post, f"/containers/{container_id}/start")
+        if not (start_resp and start_resp.status_code == 204):
+            failure = result["error"] = f"failed to start: {start_resp.text[:200] if start_resp else 'No response'}"
+            break
+        logger.info(f"Container '{container_name}' started")
+
+        # Wait until ready before anything that depends on it starts
+        ok, reason = timed(timings, "healthy", wait_healthy,
+                           container_id, svc["config"].get("Healthcheck") or {}, stop_at)
+        if not ok:
+            failure = result["error"] = reason
+            break
+        result["status"] = "healthy"
+        logger.info(f"Container '{container_name}' ready ({reason}) timings={timings}")
+
+    if failure:
+        logger.error(f"Rollout of '{label}' failed at '{results[-1]['service']}': {failure}; rolling back")
+        rollback(created_containers, created_networks)
+        restore_retired(retired)
+        for result in results:
+            if result["status"] == "healthy":
+                result["status"] = "rolled back"
+    else:
+        remove_retired(retired)
+        rollout["ok"] = True
 
-                port_key = f"{container_port}/tcp"
-                exposed_ports[port_key] = {}
-                if port_key not in port_bindings:
-                    port_bindings[port_key] = []
-                port_bindings[port_key].append({"HostPort": host_port})
-
-            # --- Healthcheck ---
-            healthcheck = svc.get("healthcheck", {})
-            hc_config = {}
-            if healthcheck:
-                def parse_duration(d):
-                    if isinstance(d, int): return d * 1_000_000_000
-                    match = re.match(r'^(\d+)([a-z]+)?$', d.strip())
-                    if not match: raise ValueError(f"Invalid duration: {d}")
-                    val, unit = match.groups()
-                    unit = unit or 's'
-                    units = {'ns':1,'us':1e3,'ms':1e6,'s':1e9,'m':60e9,'h':3600e9}
-                    return int(float(val) * units.get(unit, 1))
-                
-                hc_config = {
-                    "Test": healthcheck.get("test", ["CMD-SHELL", "exit 1"]),
-                    "Interval": parse_duration(healthcheck.get("interval", "30s")),
-                    "Timeout": parse_duration(healthcheck.get("timeout", "30s")),
-                    "Retries": healthcheck.get("retries", 3),
-                    "StartPeriod": parse_duration(healthcheck.get("start_period", "0s"))
-                }
-
-            # --- Networks ---
-            network_names = []
-            if "networks" in svc:
-                if isinstance(svc["networks"], list):
-                    network_names = svc["networks"]
-                elif isinstance(svc["networks"], dict):
-                    network_names = list(svc["networks"].keys())
-            endpoint_config = {name: {} for name in network_names}
-
-            # --- Volumes ---
-            binds = []
-            for vol in svc.get("volumes", []):
-                if isinstance(vol, str):
-                    if ":" in vol:
-                        parts = vol.split(":")
-                        if len(parts) >= 2:
-                            host_path = parts[0]
-                            container_path = parts[1]
-                            mode = parts[2] if len(parts) > 2 else "rw"
-                            binds.append(f"{host_path}:{container_path}:{mode},Z")
-
-            # --- Container Config ---
-            container_config = {
-                "Image": image,
-                "ExposedPorts": exposed_ports,
-                "Healthcheck": hc_config,
-                "HostConfig": {
-                    "PortBindings": port_bindings,
-                    "Binds": binds,
-                },
-                "NetworkingConfig": {
-                    "EndpointsConfig": endpoint_config
-                }
-            }
+    rollout["elapsed"] = round(time.monotonic() - started, 3)
+    _rollouts.append(rollout)
+    logger.info(f"Rollout of '{label}' {'succeeded' if rollout['ok'] else 'failed'} in {rollout['elapsed']}s")
+    return rollout
 
-            # Container name
-            container_name = svc.get("container_name", service_name)
 
-            # Create container
-            create_resp = api_post(f"/containers/create?name={container_name}", json=container_config)
-            if create_resp and create_resp.status_code == 201:
-                container_id = create_resp.json().get("Id")
-                logger.info(f"Container '{container_name}' created: {container_id[:12]}")
+def _deadline_arg(value):
+    """Seconds a rollout may take; raises ValueError unless a positive, finite number"""
+    if value in (None, ""):
+        return STACK_DEADLINE
+    try:
+        deadline = float(value)
+    except (TypeError, ValueError):
+        deadline = math.nan
+    if not math.isfinite(deadline) or deadline <= 0:
+        raise ValueError(f"'deadline' must be a positive number of seconds, got {value!r}")
+    return deadline
 
-                # Start container
-                start_resp = api_post(f"/containers/{container_id}/start")
-                if start_resp and start_resp.status_code == 204:
-                    logger.info(f"Container '{container_name}' started")
-                else:
-                    logger.error(f"Failed to start '{container_name}': {start_resp.text if start_resp else 'No response'}")
-            else:
-                logger.error(f"Failed to create '{container_name}': {create_resp.text if create_resp else 'No response'}")
 
+def stack_label(plan):
+    """Project label for a deploy without a stack name: the compose file's name, or
+    one derived from its container names so edits to the file keep the same label"""
+    if plan.get("name"):
+        return plan["name"]
+    names = ",".join(sorted(svc["container_name"] for svc in plan["services"]))
+    return f"stack-{hashlib.sha256(names.encode()).hexdigest()[:12]}"
+
+
+@app.route("/compose/deploy", methods=["GET", "POST"])
+def deploy_compose():
+    if request.method == "POST":
+        # Get YAML from form
+        compose_text = request.form.get("compose_yaml", "").strip()
+        stack_name = request.form.get("stack_name", "").strip()
+        if not compose_text:
+            return "<script>alert('No compose file provided'); history.back();</script>"
+
+        try:
+            deadline = _deadline_arg(request.form.get("deadline"))
+        except ValueError as e:
+            return f"<script>alert({json.dumps(str(e))}); history.back();</script>"
+
+        try:
+            digest, plan = load_stack_plan(compose_text, stack_name or None)
+        except StackError as e:
+            logger.error(f"Invalid compose file: {e}")
+            message = "Invalid compose file:\n" + "\n".join(e.errors)
+            return f"<script>alert({json.dumps(message)}); history.back();</script>"
+
+        rollout = deploy_plan(plan, stack_name or stack_label(plan), deadline)
+        if not rollout["ok"]:
+            failed = rollout["results"][-1]
+            message = f"Deploy failed at '{failed['service']}': {failed.get('error')}. Rolled back."
+            return f"<script>alert({json.dumps(message)}); history.back();</script>"
         return redirect(url_for("index"))
 
     else:
@@ -405,6 +1969,47 @@ def deploy_compose():
         return render_template("compose_deploy.html")
 
 
+@app.route("/api/stacks")
+def list_stacks():
+    with _stack_lock:
+        stacks = [{"name": name, "versions": list(versions)} for name, versions in _stacks.items()]
+    return {"stacks": stacks}
+
+
+@app.route("/api/stacks/<name>/deploy", methods=["POST"])
+def redeploy_stack(name):
+    data = request.get_json(silent=True) or {}
+    version = data.get("version")
+    if version is not None:
+        try:
+            version = int(version)
+        except (TypeError, ValueError):
+            return {"error": f"'version' must be an integer, got {version!r}"}, 400
+    entry, plan = get_stack(name, version)
+    if plan is None:
+        return {"error": f"Unknown stack '{name}'"}, 404
+
+    env = data.get("env") or {}
+    images = data.get("images") or {}
+    if not isinstance(env, dict) or not isinstance(images, dict):
+        return {"error": "'env' and 'images' must be objects"}, 400
+    if data.get("tag"):
+        images.setdefault("*", data["tag"])
+    try:
+        deadline = _deadline_arg(data.get("deadline"))
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    logger.info(f"Redeploying stack '{name}' v{entry['version']} (env={list(env)}, images={images})")
+    rollout = deploy_plan(apply_overrides(plan, env=env, images=images), name, deadline)
+    return {"version": entry["version"], "digest": entry["digest"], **rollout}, 200 if rollout["ok"] else 502
+
+
+@app.route("/api/rollouts")
+def list_rollouts():
+    return {"rollouts": list(_rollouts)}
+
+
 # 🌐 Network Actions
 @app.route("/networks/create", methods=["POST"])
 def create_network():
@@ -672,7 +2277,7 @@ def search_docker_hub():
     try:
         # Fetch search results from Docker Hub
         url = f"https://hub.docker.com/v2/repositories/library/{query}/"
-        response = requests.get(url, timeout=5)
+        response = hub_get(url)
         if response.status_code == 200:
             data = response.json()
             return {
@@ -690,7 +2295,7 @@ def search_docker_hub():
 
         # Fallback to public repositories
         url = f"https://hub.docker.com/v2/repositories/{query}/"
-        response = requests.get(url, timeout=5)
+        response = hub_get(url)
         if response.status_code == 200:
             data = response.json()
             return {
@@ -718,12 +2323,12 @@ def proxy_repo_info(image):
     try:
         # Try official library first
         url = f"https://hub.docker.com/v2/repositories/library/{image}/"
-        response = requests.get(url, timeout=5)
+        response = hub_get(url)
         
         if response.status_code != 200:
             # Try public repo
             url = f"https://hub.docker.com/v2/repositories/{image}/"
-            response = requests.get(url, timeout=5)
+            response = hub_get(url)
             if response.status_code != 200:
                 return {"found": False}
 
@@ -749,10 +2354,10 @@ def proxy_repo_info(image):
 def proxy_tag_info(image, tag):
     try:
         url = f"https://hub.docker.com/v2/repositories/library/{image}/tags/{tag}/"
-        response = requests.get(url, timeout=5)
+        response = hub_get(url)
         if response.status_code != 200:
             url = f"https://hub.docker.com/v2/repositories/{image}/tags/{tag}/"
-            response = requests.get(url, timeout=5)
+            response = hub_get(url)
             if response.status_code != 200:
                 return {}
 
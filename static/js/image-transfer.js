@@ -0,0 +1,32 @@
+// static/js/image-transfer.js - Upload an image tarball as a raw request body
+
+document.addEventListener("DOMContentLoaded", () => {
+    const form = document.getElementById("imageLoadForm");
+    if (!form) return;
+    const status = document.getElementById("imageLoadStatus");
+
+    form.addEventListener("submit", async (e) => {
+        e.preventDefault();
+        const file = document.getElementById("imageLoadFile").files[0];
+        if (!file) return;
+
+        status.textContent = `Uploading ${file.name} (${formatBytes(file.size)})...`;
+        try {
+            // Send the file itself, not multipart form data, so the server can stream it through
+            const response = await fetch("/images/load", {
+                method: "POST",
+                body: file,
+                headers: { "Content-Type": "application/x-tar" }
+            });
+            const data = await response.json().catch(() => ({}));
+            if (!response.ok) {
+                status.textContent = `Load failed: ${data.error || response.status}`;
+                return;
+            }
+            status.textContent = `Loaded in ${data.seconds}s (${data.mb_per_s} MB/s): ${data.result}`;
+            setTimeout(() => location.reload(), 2000);
+        } catch (err) {
+            status.textContent = "Error: " + err.message;
+        }
+    });
+});
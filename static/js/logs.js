@@ -0,0 +1,59 @@
+// static/js/logs.js - Stream the merged NDJSON log feed into the page
+
+const MAX_RENDERED_LINES = 5000;
+
+document.addEventListener("DOMContentLoaded", () => {
+    const form = document.getElementById("logsForm");
+    const output = document.getElementById("logOutput");
+    let controller = null;
+
+    document.getElementById("stopLogs").addEventListener("click", () => {
+        if (controller) controller.abort();
+    });
+
+    form.addEventListener("submit", async (e) => {
+        e.preventDefault();
+        if (controller) controller.abort();
+        controller = new AbortController();
+        output.textContent = "";
+
+        const params = new URLSearchParams();
+        for (const [key, value] of new FormData(form)) {
+            if (value.trim()) params.append(key, value.trim());
+        }
+
+        try {
+            const response = await fetch(`/api/logs?${params}`, { signal: controller.signal });
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                output.textContent = `Error: ${data.error || response.status}`;
+                return;
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split("\n");
+                buffer = lines.pop();
+                for (const line of lines) {
+                    if (line) appendRecord(output, JSON.parse(line));
+                }
+            }
+        } catch (err) {
+            if (err.name !== "AbortError") output.textContent += `\nError: ${err.message}`;
+        }
+    });
+});
+
+function appendRecord(output, record) {
+    const row = document.createElement("div");
+    if (record.stream === "stderr") row.className = "log-stderr";
+    row.textContent = `${record.ts} [${record.container}] ${record.line}`;
+    output.appendChild(row);
+    while (output.childElementCount > MAX_RENDERED_LINES) output.removeChild(output.firstChild);
+    output.scrollTop = output.scrollHeight;
+}
@@ -0,0 +1,45 @@
+// static/js/terminal.js - Interactive exec terminal over WebSocket
+
+document.addEventListener("DOMContentLoaded", () => {
+    const el = document.getElementById("terminal");
+    const status = document.getElementById("terminalStatus");
+    const cid = el.getAttribute("data-cid");
+
+    const term = new Terminal({ cursorBlink: true, convertEol: false });
+    const fit = new FitAddon.FitAddon();
+    term.loadAddon(fit);
+    term.open(el);
+    fit.fit();
+
+    const scheme = location.protocol === "https:" ? "wss" : "ws";
+    const ws = new WebSocket(`${scheme}://${location.host}/containers/exec/${cid}/ws`);
+    ws.binaryType = "arraybuffer";
+    const encoder = new TextEncoder();
+
+    // Control messages are text frames; terminal I/O is binary
+    const sendResize = () => {
+        if (ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({ type: "resize", rows: term.rows, cols: term.cols }));
+        }
+    };
+
+    ws.onopen = () => {
+        status.textContent = "Connected";
+        sendResize();
+        term.focus();
+    };
+    ws.onmessage = (e) => {
+        term.write(typeof e.data === "string" ? e.data : new Uint8Array(e.data));
+    };
+    ws.onclose = () => {
+        status.textContent = "Disconnected";
+        term.write("\r\n[connection closed]\r\n");
+    };
+
+    // Every keystroke goes out immediately as its own frame
+    term.onData((data) => {
+        if (ws.readyState === WebSocket.OPEN) ws.send(encoder.encode(data));
+    });
+    term.onResize(sendResize);
+    window.addEventListener("resize", () => fit.fit());
+});
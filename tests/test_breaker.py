@@ -0,0 +1,89 @@
+# tests/test_breaker.py - circuit breaker states and upstream admission
+import pytest
+import requests
+
+import app
+from app import CircuitBreaker, UpstreamUnavailable, upstream_call, upstream_request
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def respond(monkeypatch, outcome):
+    """Make requests.request return a status code or raise an exception"""
+    def fake_request(method, url, **kwargs):
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+    monkeypatch.setattr(app.requests, "request", fake_request)
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout  # due for a probe
+
+
+def test_opens_after_threshold_and_fails_fast(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    respond(monkeypatch, 503)
+    for _ in range(2):
+        upstream_request(breaker, "GET", "http://podman")
+    assert breaker.state == "open" and breaker.is_open()
+    with pytest.raises(UpstreamUnavailable):
+        upstream_request(breaker, "GET", "http://podman")
+
+
+def test_half_open_probe_success_closes(monkeypatch):
+    breaker = CircuitBreaker("test")
+    open_breaker(breaker)
+    respond(monkeypatch, 200)
+    upstream_request(breaker, "GET", "http://podman")
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_only_one_probe_at_a_time():
+    breaker = CircuitBreaker("test")
+    open_breaker(breaker)
+    assert breaker.allow() == "probe"
+    assert not breaker.allow()
+
+
+def test_probe_is_handed_back_on_unexpected_errors():
+    breaker = CircuitBreaker("test")
+    open_breaker(breaker)
+    with pytest.raises(KeyError):
+        with upstream_call(breaker):
+            raise KeyError("bug")
+    assert breaker.allow() == "probe"
+    assert breaker.in_flight == 0
+
+
+def test_connection_errors_count_as_failures(monkeypatch):
+    breaker = CircuitBreaker("test")
+    respond(monkeypatch, requests.exceptions.ConnectionError("refused"))
+    with pytest.raises(requests.exceptions.ConnectionError):
+        upstream_request(breaker, "GET", "http://podman")
+    assert breaker.failures == 1
+
+
+def test_read_timeouts_of_long_operations_do_not_count(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    respond(monkeypatch, requests.exceptions.ReadTimeout("slow pull"))
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        upstream_request(breaker, "POST", "http://podman", count_timeouts=False)
+    assert breaker.state == "closed" and breaker.failures == 0
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        upstream_request(breaker, "POST", "http://podman")
+    assert breaker.state == "open"
+
+
+def test_concurrency_limit_rejects_when_queue_times_out():
+    breaker = CircuitBreaker("test", max_concurrency=1, queue_timeout=0.05)
+    with upstream_call(breaker):
+        with pytest.raises(UpstreamUnavailable):
+            with upstream_call(breaker):
+                pass
+    assert breaker.in_flight == 0
@@ -0,0 +1,74 @@
+# tests/test_images.py - image transfers and their admission limits
+import threading
+
+import pytest
+import requests
+
+import app
+from app import PODMAN_BREAKER, PRIMARY_NODE, UpstreamUnavailable, image_load_stream
+
+
+class FakeResponse:
+    status_code = 200
+    text = '{"stream": "Loaded image: x"}'
+
+
+@pytest.fixture
+def slow_upload(monkeypatch):
+    """requests.request blocks until release is set, like an upload still streaming"""
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def fake_request(method, url, **kwargs):
+        started.release()
+        release.wait(5)
+        return FakeResponse()
+
+    monkeypatch.setattr(app.requests, "request", fake_request)
+    yield started, release
+    release.set()
+
+
+def test_uploads_hold_no_breaker_slot_and_are_limited_per_node(slow_upload):
+    started, release = slow_upload
+    threads = [threading.Thread(target=image_load_stream, args=(PRIMARY_NODE, iter([b"tar"])))
+               for _ in range(app.IMAGE_MAX_TRANSFERS)]
+    for t in threads:
+        t.start()
+    for _ in threads:
+        assert started.acquire(timeout=2)
+
+    assert PODMAN_BREAKER.in_flight == 0
+    with pytest.raises(UpstreamUnavailable):
+        image_load_stream(PRIMARY_NODE, iter([b"tar"]))
+
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert image_load_stream(PRIMARY_NODE, iter([b"tar"])).status_code == 200
+
+
+def test_full_node_answers_503(slow_upload):
+    started, release = slow_upload
+    threads = [threading.Thread(target=image_load_stream, args=(PRIMARY_NODE, iter([b"tar"])))
+               for _ in range(app.IMAGE_MAX_TRANSFERS)]
+    for t in threads:
+        t.start()
+    for _ in threads:
+        assert started.acquire(timeout=2)
+    resp = app.app.test_client().post("/images/load", data=b"tar")
+    assert resp.status_code == 503 and resp.headers["Retry-After"]
+    release.set()
+    for t in threads:
+        t.join(2)
+
+
+def test_upload_read_timeout_is_not_a_podman_failure(monkeypatch):
+    def fake_request(method, url, **kwargs):
+        raise requests.exceptions.ReadTimeout("still loading")
+
+    monkeypatch.setattr(app.requests, "request", fake_request)
+    failures = PODMAN_BREAKER.failures
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        image_load_stream(PRIMARY_NODE, iter([b"tar"]))
+    assert PODMAN_BREAKER.failures == failures
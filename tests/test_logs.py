@@ -0,0 +1,98 @@
+# tests/test_logs.py - log demultiplexing, merging and source admission
+import io
+import threading
+import time
+
+import pytest
+
+import app
+from app import LogSource, merge_logs, _iter_log_chunks, _log_time_arg
+
+
+def frame(stream, text):
+    data = text.encode()
+    return bytes([stream, 0, 0, 0]) + len(data).to_bytes(4, "big") + data
+
+
+class FakeLogResponse:
+    def __init__(self, body, status_code=200):
+        self.raw = io.BytesIO(body)
+        self.status_code = status_code
+        self.text = ""
+
+    def close(self):
+        pass
+
+
+def serve_logs(monkeypatch, bodies, delay=0.0):
+    """Answer /containers/<id>/logs from bodies[id], recording peak concurrency"""
+    stats = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_request(method, url, **kwargs):
+        with lock:
+            stats["active"] += 1
+            stats["peak"] = max(stats["peak"], stats["active"])
+        time.sleep(delay)
+        with lock:
+            stats["active"] -= 1
+        return FakeLogResponse(bodies[url.split("/containers/")[1].split("/")[0]])
+
+    monkeypatch.setattr(app.requests, "request", fake_request)
+    return stats
+
+
+def run_merge(ids, matcher=None):
+    wakeup = threading.Event()
+    sources = [LogSource(cid, cid, {"follow": "false"}, matcher, wakeup) for cid in ids]
+    for src in sources:
+        src.start()
+    return list(merge_logs(sources, follow=False))
+
+
+def test_multiplexed_frames_are_read_in_bounded_pieces(monkeypatch):
+    monkeypatch.setattr(app, "LOG_MAX_LINE", 10)
+    body = frame(1, "a" * 25) + frame(2, "err")
+    chunks = list(_iter_log_chunks(FakeLogResponse(body)))
+    assert chunks == [("stdout", b"a" * 10), ("stdout", b"a" * 10), ("stdout", b"a" * 5), ("stderr", b"err")]
+
+
+def test_merge_orders_by_timestamp_across_containers(monkeypatch):
+    serve_logs(monkeypatch, {
+        "a": frame(1, "2024-01-01T00:00:01Z a1\n") + frame(2, "2024-01-01T00:00:03Z a3\n"),
+        "b": frame(1, "2024-01-01T00:00:02.5Z b2\n") + frame(1, "2024-01-01T00:00:04Z b4\n"),
+    })
+    records = run_merge(["a", "b"])
+    assert [r["line"] for r in records] == ["a1", "b2", "a3", "b4"]
+    assert records[1] == {"ts": "2024-01-01T00:00:02.5Z", "container": "b", "stream": "stdout", "line": "b2"}
+    assert records[2]["stream"] == "stderr"
+
+
+def test_merge_filters_server_side(monkeypatch):
+    serve_logs(monkeypatch, {"a": frame(1, "2024-01-01T00:00:01Z ok\n") + frame(1, "2024-01-01T00:00:02Z error x\n")})
+    assert [r["line"] for r in run_merge(["a"], matcher=lambda m: "error" in m)] == ["error x"]
+
+
+def test_many_sources_are_admitted_without_drops_or_shedding(monkeypatch):
+    ids = [f"c{i:02d}" for i in range(app.LOG_MAX_SOURCES)]
+    stats = serve_logs(monkeypatch, {cid: frame(1, f"2024-01-01T00:00:{i:02d}Z line {cid}\n")
+                                     for i, cid in enumerate(ids)}, delay=0.05)
+    records = run_merge(ids)
+    assert [r["container"] for r in records] == ids
+    assert all(r["stream"] == "stdout" for r in records)
+    assert stats["peak"] <= app.LOG_OPEN_CONCURRENCY < app.PODMAN_BREAKER.max_concurrency
+    assert not app.PODMAN_BREAKER.saturated()
+
+
+@pytest.mark.parametrize("value", ["10m", "1h30m", "1.5h", "90s"])
+def test_time_arg_accepts_durations(value):
+    ago = time.time() - app.parse_duration(value) / 1e9
+    assert abs(int(_log_time_arg(value)) - ago) <= 1
+
+
+def test_time_arg_accepts_timestamps():
+    assert _log_time_arg("1700000000") == "1700000000"
+    assert _log_time_arg("2024-01-01T00:00:00Z") == "1704067200"
+    assert _log_time_arg("") is None
+    with pytest.raises(ValueError):
+        _log_time_arg("yesterday")
@@ -0,0 +1,160 @@
+# tests/test_stack.py - compose validation and compilation
+import pytest
+
+from app import STACK_DEADLINE, StackError, compile_stack, parse_duration, stack_label, _deadline_arg, _with_tag
+
+
+def compile_service(body, extra=""):
+    """Compile a one-service stack; body is the YAML under services.web"""
+    text = "services:\n  web:\n    image: nginx:alpine\n" + body + extra
+    return compile_stack(text)["services"][0]
+
+
+def stack_errors(text):
+    with pytest.raises(StackError) as exc:
+        compile_stack(text)
+    return exc.value.errors
+
+
+@pytest.mark.parametrize("port, key, binding", [
+    ("80", "80/tcp", {"HostPort": ""}),
+    ("8080:80", "80/tcp", {"HostPort": "8080"}),
+    ("53:53/udp", "53/udp", {"HostPort": "53"}),
+    ("127.0.0.1:8080:80", "80/tcp", {"HostPort": "8080", "HostIp": "127.0.0.1"}),
+    ("[::1]:8080:80", "80/tcp", {"HostPort": "8080", "HostIp": "::1"}),
+    (80, "80/tcp", {"HostPort": ""}),
+])
+def test_port_forms(port, key, binding):
+    config = compile_service(f"    ports:\n      - {port!r}\n" if isinstance(port, str) else f"    ports:\n      - {port}\n")["config"]
+    assert config["HostConfig"]["PortBindings"] == {key: [binding]}
+    assert key in config["ExposedPorts"]
+
+
+@pytest.mark.parametrize("port, message", [
+    ("8000-8010:80", "port ranges are not supported:"),
+    ("http:80", "invalid port mapping"),
+])
+def test_bad_ports_are_reported_with_line(port, message):
+    errors = stack_errors(f"services:\n  web:\n    image: x\n    ports:\n      - '8080:80'\n      - '{port}'\n")
+    assert errors == [f"line 6: services.web: {message} {port!r}"]
+
+
+@pytest.mark.parametrize("value, nanos", [
+    (5, 5_000_000_000),
+    ("30", 30_000_000_000),
+    ("30s", 30_000_000_000),
+    ("1.5s", 1_500_000_000),
+    ("1m30s", 90_000_000_000),
+    ("1h2m", 3_720_000_000_000),
+    ("250ms", 250_000_000),
+])
+def test_parse_duration(value, nanos):
+    assert parse_duration(value) == nanos
+
+
+@pytest.mark.parametrize("value", ["", "soon", "5x", "1m 30s", "s30"])
+def test_parse_duration_rejects(value):
+    with pytest.raises(ValueError):
+        parse_duration(value)
+
+
+def test_bad_healthcheck_duration_is_reported_with_line():
+    errors = stack_errors("services:\n  web:\n    image: x\n    healthcheck:\n      test: 'true'\n      interval: often\n")
+    assert errors == ["line 6: services.web: healthcheck.interval: Invalid duration: often"]
+
+
+def test_healthcheck_sends_only_set_fields():
+    hc = compile_service("    healthcheck:\n      interval: 5s\n      retries: 5\n")["config"]["Healthcheck"]
+    assert hc == {"Interval": 5_000_000_000, "Retries": 5}
+    hc = compile_service("    healthcheck:\n      disable: true\n")["config"]["Healthcheck"]
+    assert hc == {"Test": ["NONE"]}
+
+
+def test_networks():
+    svc = compile_service("    networks: [front]\n", "networks:\n  front:\n")
+    assert svc["config"]["NetworkingConfig"]["EndpointsConfig"] == {"front": {}}
+
+    errors = stack_errors("services:\n  web:\n    image: x\n    networks:\n      - front\n      - {back: 1}\n"
+                          "networks:\n  front:\n")
+    assert errors == ["line 6: services.web: network entry must be a name, got {'back': 1}"]
+
+    errors = stack_errors("services:\n  web:\n    image: x\n    networks: [missing]\n")
+    assert errors == ["line 4: services.web: undefined network 'missing'"]
+
+
+def test_depends_on_validation():
+    errors = stack_errors("services:\n  web:\n    image: x\n    depends_on:\n      - [db]\n      - cache\n")
+    assert errors == [
+        "line 5: services.web: depends_on entry must be a service name, got ['db']",
+        "line 5: services.web: depends on undefined service 'cache'",
+    ]
+
+
+def test_depends_on_orders_rollout_and_detects_cycles():
+    plan = compile_stack("services:\n  web:\n    image: x\n    depends_on: [db]\n  db:\n    image: y\n")
+    assert [svc["service"] for svc in plan["services"]] == ["db", "web"]
+
+    errors = stack_errors("services:\n  a:\n    image: x\n    depends_on: [b]\n  b:\n    image: y\n    depends_on: [a]\n")
+    assert len(errors) == 1 and "dependency cycle" in errors[0]
+
+
+def test_every_problem_is_reported_with_its_line():
+    errors = stack_errors(
+        "services:\n"             # 1
+        "  web:\n"                # 2
+        "    build: .\n"          # 3
+        "    restart: sometimes\n"  # 4
+        "    ports: ['x:80']\n"   # 5
+        "  db: 5\n"               # 6
+    )
+    assert errors == [
+        "line 3: services.web: 'build' is not supported",
+        "line 3: services.web: 'image' is required (build is not supported)",
+        "line 4: services.web: invalid restart policy 'sometimes'",
+        "line 5: services.web: invalid port mapping 'x:80'",
+        "line 6: services.db: must be a mapping",
+    ]
+
+
+def test_invalid_yaml_reports_line():
+    errors = stack_errors("services:\n  web:\n    image: [x\n")
+    assert len(errors) == 1 and errors[0].startswith("line ")
+
+
+def test_repo_compose_file_compiles():
+    with open("docker-compose.yml") as f:
+        plan = compile_stack(f.read())
+    app = next(svc for svc in plan["services"] if svc["service"] == "app")
+    assert app["config"]["Cmd"] == ["sleep", "infinity"]
+    assert app["config"]["HostConfig"]["RestartPolicy"] == {"Name": "unless-stopped", "MaximumRetryCount": 0}
+
+
+@pytest.mark.parametrize("image, tag, expected", [
+    ("nginx:alpine", "1.25", "nginx:1.25"),
+    ("nginx", "1.25", "nginx:1.25"),
+    ("localhost:5000/app:v1", "v2", "localhost:5000/app:v2"),
+    ("localhost:5000/app", "v2", "localhost:5000/app:v2"),
+    ("app@sha256:abc", "v2", "app:v2"),
+    ("nginx:alpine", "redis:7", "redis:7"),
+])
+def test_with_tag(image, tag, expected):
+    assert _with_tag(image, tag) == expected
+
+
+@pytest.mark.parametrize("value", ["nan", "inf", "-inf", "-1", "0", "soon", [1]])
+def test_deadline_rejects_non_positive_or_non_finite(value):
+    with pytest.raises(ValueError):
+        _deadline_arg(value)
+
+
+def test_deadline_defaults_and_parses():
+    assert _deadline_arg(None) == _deadline_arg("") == STACK_DEADLINE
+    assert _deadline_arg("12.5") == 12.5
+
+
+def test_unnamed_stack_label_survives_edits():
+    before = compile_stack("services:\n  a:\n    image: x\n    container_name: my-a\n  b:\n    image: y\n")
+    after = compile_stack("services:\n  b:\n    image: y:2\n  a:\n    image: x\n    container_name: my-a\n"
+                          "    environment: [DEBUG=1]\n")
+    assert stack_label(before) == stack_label(after)
+    assert stack_label(compile_stack("name: shop\nservices:\n  a:\n    image: x\n")) == "shop"